@@ -1,4 +1,4 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -7,6 +7,7 @@ import os
 from dotenv import load_dotenv
 from services.document_service import DocumentService
 from services.rag_service import RAGService
+from services.conversation_service import ConversationService
 
 load_dotenv()
 
@@ -23,11 +24,13 @@ app.add_middleware(
 app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
 document_service = DocumentService()
-rag_service = RAGService(document_service)
+conversation_service = ConversationService(document_service.token_counter)
+rag_service = RAGService(document_service, conversation_service)
 
 class ChatRequest(BaseModel):
     message: str
-    conversation_history: Optional[List[dict]] = None
+    session_id: Optional[str] = None  # Server-side conversation session; created if missing or unknown
+    conversation_history: Optional[List[dict]] = None  # Deprecated: stateless mode, used only without session_id
 
 class ChunkInfo(BaseModel):
     similarity_score: float
@@ -52,6 +55,7 @@ class ChatResponse(BaseModel):
     context_tokens_used: int
     context_metrics: ContextMetrics
     enhanced_query: Optional[str] = None  # The query actually used for retrieval
+    session_id: Optional[str] = None  # None for stateless (conversation_history) requests
 
 class DocumentInfo(BaseModel):
     id: str
@@ -141,16 +145,22 @@ async def delete_document(document_id: str):
 async def clear_documents():
     document_service.clear_documents()
     rag_service.vector_store.clear()
+    conversation_service.clear_sessions()
     return {"message": "All documents cleared"}
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, background_tasks: BackgroundTasks):
     try:
         result = await rag_service.chat(
             message=request.message,
-            conversation_history=request.conversation_history or []
+            conversation_history=request.conversation_history,
+            session_id=request.session_id
         )
         
+        # Summarize older turns after the response is sent (runs in the threadpool)
+        if result["session_id"]:
+            background_tasks.add_task(conversation_service.compact_session, result["session_id"])
+        
         return ChatResponse(
             response=result["response"],
             mode=result["mode"],
@@ -159,13 +169,39 @@ async def chat(request: ChatRequest):
             relevant_chunks=result["relevant_chunks"],
             context_tokens_used=result["context_tokens_used"],
             context_metrics=result["context_metrics"],
-            enhanced_query=result.get("enhanced_query")
+            enhanced_query=result.get("enhanced_query"),
+            session_id=result["session_id"]
         )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = conversation_service.get_session(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Session not found")
+    
+    return {
+        "id": session.id,
+        "created_at": session.created_at.isoformat(),
+        "updated_at": session.updated_at.isoformat(),
+        "summary": session.summary,
+        "summary_token_count": session.summary_token_count,
+        "summarized_message_count": session.summarized_message_count,
+        "messages": [{"role": msg.role, "content": msg.content} for msg in session.messages],
+        "history_token_count": session.history_tokens(),
+        "history_token_budget": conversation_service.history_token_budget
+    }
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if conversation_service.delete_session(session_id):
+        return {"message": "Session deleted successfully"}
+    else:
+        raise HTTPException(status_code=404, detail="Session not found")
+
 @app.get("/status")
 async def get_status():
     context_metrics = rag_service.get_context_metrics()
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, PrivateAttr
+from typing import List
+from datetime import datetime
+import threading
+
+class ConversationMessage(BaseModel):
+    role: str
+    content: str
+    token_count: int
+
+class ConversationSession(BaseModel):
+    id: str
+    messages: List[ConversationMessage] = []
+    summary: str = ""
+    summary_token_count: int = 0
+    summarized_message_count: int = 0
+    created_at: datetime
+    updated_at: datetime
+    # Guards messages/summary between request handlers and background compaction
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def lock(self) -> threading.Lock:
+        return self._lock
+
+    def history_tokens(self) -> int:
+        return sum(msg.token_count for msg in self.messages)
@@ -0,0 +1,218 @@
+import openai
+from typing import List, Optional
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from models.conversation import ConversationMessage, ConversationSession
+from utils.token_counter import TokenCounter
+
+class ConversationService:
+    def __init__(self, token_counter: Optional[TokenCounter] = None):
+        # Ordered least -> most recently updated, for TTL pruning and LRU eviction
+        self.sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self.token_counter = token_counter or TokenCounter()
+        self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.summary_model = "gpt-4o-mini"
+        self.history_token_budget = 4000  # Max tokens of summary + history sent with each turn
+        self.compaction_target_tokens = 2000  # Recent history kept verbatim after compaction
+        self.max_summary_tokens = 500
+        self.session_ttl = timedelta(hours=2)  # Idle sessions are dropped after this long
+        self.max_sessions = 1000  # Least recently updated sessions are evicted beyond this
+        self._sessions_lock = threading.Lock()
+        self._compacting = set()  # Session IDs with a compaction in flight
+        self._compacting_lock = threading.Lock()
+
+    def get_session(self, session_id: str) -> Optional[ConversationSession]:
+        with self._sessions_lock:
+            self._prune_expired_sessions()
+            return self.sessions.get(session_id)
+
+    def create_session(self) -> ConversationSession:
+        now = datetime.now()
+        session = ConversationSession(
+            id=str(uuid.uuid4()),
+            created_at=now,
+            updated_at=now
+        )
+        with self._sessions_lock:
+            self._prune_expired_sessions()
+            self.sessions[session.id] = session
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        return session
+
+    def delete_session(self, session_id: str) -> bool:
+        with self._sessions_lock:
+            return self.sessions.pop(session_id, None) is not None
+
+    def clear_sessions(self):
+        with self._sessions_lock:
+            self.sessions.clear()
+
+    def _prune_expired_sessions(self):
+        # Sessions are ordered by updated_at, so expired ones are all at the front
+        cutoff = datetime.now() - self.session_ttl
+        while self.sessions:
+            session = next(iter(self.sessions.values()))
+            if session.updated_at >= cutoff:
+                break
+            self.sessions.popitem(last=False)
+
+    def add_message(self, session: ConversationSession, role: str, content: str):
+        message = ConversationMessage(
+            role=role,
+            content=content,
+            token_count=self.token_counter.count_tokens(content)
+        )
+        with session.lock:
+            session.messages.append(message)
+            session.updated_at = datetime.now()
+        with self._sessions_lock:
+            if session.id in self.sessions:
+                self.sessions.move_to_end(session.id)
+
+    def get_prompt_history(self, session: ConversationSession) -> List[dict]:
+        """
+        Build the history to send with the next turn: the rolling summary (if any)
+        followed by the most recent turns that fit in the history token budget.
+        """
+        with session.lock:
+            summary = session.summary
+            budget = self.history_token_budget - session.summary_token_count
+            messages = [{"role": msg.role, "content": msg.content} for msg in session.messages]
+            token_counts = [msg.token_count for msg in session.messages]
+
+        messages = self.fit_to_budget(messages, budget, token_counts)
+
+        if summary:
+            summary_message = {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}"
+            }
+            messages.insert(0, summary_message)
+
+        return messages
+
+    def fit_to_budget(self, messages: List[dict], budget: Optional[int] = None, token_counts: Optional[List[int]] = None) -> List[dict]:
+        """
+        Keep the newest whole turns (a user message and the replies to it) whose
+        combined token count fits in the budget.
+        """
+        if budget is None:
+            budget = self.history_token_budget
+        if token_counts is None:
+            # Client-supplied history: drop malformed entries before counting
+            messages = [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in messages
+                if isinstance(msg, dict)
+                and isinstance(msg.get('role'), str) and msg.get('role')
+                and isinstance(msg.get('content'), str) and msg.get('content')
+            ]
+            token_counts = [self.token_counter.count_tokens(msg['content']) for msg in messages]
+
+        turns = []
+        for msg, token_count in zip(messages, token_counts):
+            if msg['role'] == 'user' or not turns:
+                turns.append(([], 0))
+            turn_messages, turn_tokens = turns[-1]
+            turn_messages.append(msg)
+            turns[-1] = (turn_messages, turn_tokens + token_count)
+
+        kept = []
+        used_tokens = 0
+        for turn_messages, turn_tokens in reversed(turns):
+            if used_tokens + turn_tokens > budget:
+                break
+            kept = turn_messages + kept
+            used_tokens += turn_tokens
+
+        return kept
+
+    def compact_session(self, session_id: str):
+        """
+        Fold older messages into the rolling summary once summary + history exceed
+        the budget, keeping roughly compaction_target_tokens of recent turns verbatim.
+
+        Blocking (it calls the summary model); run it off the request path.
+        """
+        with self._compacting_lock:
+            if session_id in self._compacting:
+                return
+            self._compacting.add(session_id)
+
+        try:
+            session = self.get_session(session_id)
+            if session:
+                self._compact(session)
+        finally:
+            with self._compacting_lock:
+                self._compacting.discard(session_id)
+
+    def _compact(self, session: ConversationSession):
+        with session.lock:
+            if session.summary_token_count + session.history_tokens() <= self.history_token_budget:
+                return
+
+            # Find the oldest message that can stay verbatim
+            split_index = len(session.messages)
+            kept_tokens = 0
+            while split_index > 0:
+                token_count = session.messages[split_index - 1].token_count
+                if kept_tokens + token_count > self.compaction_target_tokens:
+                    break
+                kept_tokens += token_count
+                split_index -= 1
+
+            to_summarize = session.messages[:split_index]
+            current_summary = session.summary
+
+        if not to_summarize:
+            return
+
+        transcript = "\n".join(f"{msg.role}: {msg.content}" for msg in to_summarize)
+
+        summary_prompt = f"""Update the running summary of a conversation between a user and an assistant answering questions about documents.
+
+Current Summary:
+{current_summary or "(none)"}
+
+New Conversation Turns:
+{transcript}
+
+Instructions:
+- Merge the new turns into the current summary
+- Preserve facts, names, numbers and document references the user may ask about again
+- Keep track of open questions and what the user is interested in
+- Be concise; do not exceed {self.max_summary_tokens} tokens
+
+Updated Summary:"""
+
+        try:
+            response = self.client.chat.completions.create(
+                model=self.summary_model,
+                messages=[{"role": "user", "content": summary_prompt}],
+                temperature=0.3,
+                max_tokens=self.max_summary_tokens
+            )
+
+            summary = response.choices[0].message.content.strip()
+            if not summary:
+                return
+
+        except Exception as e:
+            # Keep the uncompacted history; get_prompt_history still enforces the budget
+            print(f"Conversation compaction failed: {e}")
+            return
+
+        summary_token_count = self.token_counter.count_tokens(summary)
+
+        # Only compaction removes messages and it never overlaps for a session, so
+        # split_index still points past the summarized ones; newer turns follow it
+        with session.lock:
+            session.summary = summary
+            session.summary_token_count = summary_token_count
+            session.summarized_message_count += len(to_summarize)
+            del session.messages[:split_index]
@@ -3,12 +3,14 @@ from typing import List, Tuple, Optional
 import os
 from services.embedding_service import EmbeddingService
 from services.document_service import DocumentService
+from services.conversation_service import ConversationService
 from storage.vector_store import VectorStore
 from models.document import DocumentChunk
 
 class RAGService:
-    def __init__(self, document_service: DocumentService):
+    def __init__(self, document_service: DocumentService, conversation_service: Optional[ConversationService] = None):
         self.document_service = document_service
+        self.conversation_service = conversation_service or ConversationService(document_service.token_counter)
         self.embedding_service = EmbeddingService()
         self.vector_store = VectorStore()
         self.client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
@@ -135,9 +137,18 @@ Enhanced Query:"""
             "mode": mode
         }
     
-    async def chat(self, message: str, conversation_history: List[dict] = None) -> dict:
-        if conversation_history is None:
-            conversation_history = []
+    async def chat(self, message: str, conversation_history: List[dict] = None, session_id: Optional[str] = None) -> dict:
+        # Clients that resend their own history stay stateless; just enforce the budget
+        stateless = session_id is None and conversation_history is not None
+        session = None
+        
+        if stateless:
+            conversation_history = self.conversation_service.fit_to_budget(conversation_history)
+        else:
+            # Unknown or expired IDs fall through to a new session once the reply succeeds
+            session = self.conversation_service.get_session(session_id) if session_id else None
+            # Summary + recent turns, bounded by the history token budget
+            conversation_history = self.conversation_service.get_prompt_history(session) if session else []
         
         mode = "rag" if self.should_use_rag() else "full_context"
         
@@ -177,6 +188,14 @@ Enhanced Query:"""
             
             assistant_response = response.choices[0].message.content
             
+            # Sessions are only created for successful turns; compaction is left to
+            # the caller so it runs after the response is sent
+            if not stateless:
+                if session is None:
+                    session = self.conversation_service.create_session()
+                self.conversation_service.add_message(session, "user", message)
+                self.conversation_service.add_message(session, "assistant", assistant_response)
+            
             # Calculate actual context token usage
             context_token_count = self.document_service.token_counter.count_tokens(context) if context else 0
             
@@ -188,7 +207,8 @@ Enhanced Query:"""
                 "relevant_chunks": relevant_chunks if mode == "rag" else [],
                 "context_tokens_used": context_token_count,
                 "context_metrics": self.get_context_metrics(),
-                "enhanced_query": enhanced_query if mode == "rag" else None
+                "enhanced_query": enhanced_query if mode == "rag" else None,
+                "session_id": session.id if session else None
             }
             
         except Exception as e:
@@ -1,7 +1,7 @@
 class RAGChat {
     constructor() {
         this.apiBase = 'http://localhost:8000';
-        this.conversationHistory = [];
+        this.sessionId = null;
         this.initializeElements();
         this.attachEventListeners();
         this.loadStatus();
@@ -223,7 +223,7 @@ class RAGChat {
             if (response.ok) {
                 this.loadDocuments();
                 this.loadStatus();
-                this.conversationHistory = [];
+                this.sessionId = null;  // The server clears sessions along with documents
                 this.showMessage('All documents cleared', 'system');
             }
         } catch (error) {
@@ -285,7 +285,7 @@ class RAGChat {
                 },
                 body: JSON.stringify({
                     message: message,
-                    conversation_history: this.conversationHistory
+                    session_id: this.sessionId
                 })
             });
 
@@ -299,11 +299,8 @@ class RAGChat {
             // Remove typing indicator
             this.removeTypingIndicator(typingIndicator);
             
-            // Update conversation history
-            this.conversationHistory.push(
-                { role: 'user', content: message },
-                { role: 'assistant', content: result.response }
-            );
+            // Conversation history is kept server-side under this session
+            this.sessionId = result.session_id;
 
             // Show response with metadata and chunks
             let metadata = `Mode: ${result.mode.replace('_', ' ')} • ${result.relevant_chunks_count > 0 ? `${result.relevant_chunks_count} chunks retrieved • ` : ''}Context: ${result.context_tokens_used.toLocaleString()} tokens`;
@@ -831,7 +828,7 @@ class RAGChat {
     newConversation() {
         if (!confirm('Start a new conversation? This will clear the current chat history.')) return;
         
-        this.conversationHistory = [];
+        this.resetSession();
         
         this.chatMessages.innerHTML = `
             <div class="message system-message">
@@ -844,6 +841,13 @@ class RAGChat {
         
         this.showMessage('New conversation started', 'system');
     }
+    
+    resetSession() {
+        if (this.sessionId) {
+            fetch(`${this.apiBase}/sessions/${this.sessionId}`, { method: 'DELETE' }).catch(() => {});
+        }
+        this.sessionId = null;
+    }
 }
 
 // Initialize the app when the page loads